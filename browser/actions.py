@@ -9,6 +9,21 @@ from .core import get_driver
 from .actions_impl.utils import remove_overlays
 from .actions_impl import interaction, nav, forms, search, system
 
+# Actions handled by perform_action (used by the dispatcher's lookup table)
+SUPPORTED_ACTIONS = frozenset({
+    # Interaction
+    "click", "hover", "focus", "right_click", "type", "clear", "drag_and_drop", "upload_file",
+    # Navigation
+    "scroll", "scroll_element", "switch_frame", "switch_default_content",
+    "new_tab", "switch_tab", "open_in_new_tab", "close_tab", "list_tabs",
+    # Forms
+    "select", "checkbox", "radio", "slider", "datepicker", "colorpicker", "get_value", "submit", "fill_form",
+    # Search
+    "find_element", "find_on_page", "quick_find",
+    # System
+    "get_clipboard", "get_console_logs", "handle_alert", "set_zoom", "check_downloads", "press_key", "media_control",
+})
+
 def perform_action(action: str, payload: str = None) -> str:
     driver = get_driver()
     if not driver:
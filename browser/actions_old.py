@@ -434,12 +434,11 @@ def perform_action(action: str, payload: str = None) -> str:
         # LEARN: If we found the element via fallback, generate and save robust XPath
         if not cached_xpath:
             try:
-                from .xpath_journal import extract_element_name, generate_robust_xpath, save_xpath
-                new_xpath = generate_robust_xpath(el, driver)
+                from .xpath_journal import describe_element, save_xpath
+                # Semantic name (e.g. "Login") and XPath from one attribute fetch
+                semantic_name, new_xpath = describe_element(el, driver)
                 if new_xpath:
-                    # Try to get a semantic name (e.g. "Login") instead of just the selector
                     # If payload was a number or selector, we prefer the extracted name
-                    semantic_name = extract_element_name(el)
                     
                     # If the payload looks like a name (not a selector/number), use it. 
                     # Otherwise prefer the extracted semantic name.
@@ -493,7 +492,7 @@ def perform_action(action: str, payload: str = None) -> str:
         sel = sel.strip()
         
         # 0. Check XPath Journal first
-        from .xpath_journal import get_xpath, save_xpath, generate_robust_xpath, extract_element_name
+        from .xpath_journal import get_xpath, save_xpath, describe_element
         cached_xpath = get_xpath(driver.current_url, sel)
         if cached_xpath:
             try:
@@ -570,10 +569,9 @@ def perform_action(action: str, payload: str = None) -> str:
             # LEARN: If we found the element via fallback, generate and save robust XPath
             if not cached_xpath:
                 try:
-                    new_xpath = generate_robust_xpath(el, driver)
+                    # Semantic name (e.g. "Search") and XPath from one attribute fetch
+                    semantic_name, new_xpath = describe_element(el, driver)
                     if new_xpath:
-                        # Try to get a semantic name (e.g. "Search") instead of just the selector
-                        semantic_name = extract_element_name(el)
                         
                         # If the selector looks like a name (not a CSS selector), use it.
                         # Otherwise prefer the extracted semantic name.
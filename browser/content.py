@@ -2,20 +2,90 @@
 Browser Content Extraction
 Handles screenshots, Set-of-Marks (SoM), and text content extraction
 """
+import io
 import os
+import logging
 import time
-import json
-from PIL import Image
-import pytesseract
+import shutil
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 from ...safety import get_workspace_path
 from .core import get_driver
+from .helpers import wait_dom_stable, wait_page_ready
+from .actions_impl.utils import remove_overlays
 from . import core  # Import module to modify global variables
 
+log = logging.getLogger(__name__)
+
+# Resolved once at import instead of re-scanning $PATH on every snap
+_HAS_TESSERACT = shutil.which("tesseract") is not None
+
+# OCR runs in the background while the snap finishes its DOM work
+_OCR_POOL = ThreadPoolExecutor(max_workers=1)
+
+# Screenshot files are written in the background while the snap keeps talking to the browser
+_IO_POOL = ThreadPoolExecutor(max_workers=2)
+
+# Tesseract time scales with pixel count; viewport text gains nothing above this width
+_OCR_MAX_WIDTH = 1600
+# LSTM engine only, single uniform text block (skips legacy init and layout analysis)
+_OCR_CONFIG = "--oem 1 --psm 6"
+
+
+# Actions handled by perform_content_action (used by the dispatcher's lookup table)
+SUPPORTED_ACTIONS = frozenset({
+    "scan", "screenshot", "snap", "capture_with_som", "get_content",
+})
+
+
+@functools.cache
+def _screenshots_dir():
+    """Workspace screenshots directory, created on first use."""
+    path = os.path.join(get_workspace_path(), "screenshots")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _ocr_image(source):
+    """Run tesseract on an image path or file object (downscaled if wide) and return the stripped text."""
+    from PIL import Image
+    import pytesseract
+    with Image.open(source) as img:
+        if img.width > _OCR_MAX_WIDTH:
+            new_height = int(img.height * _OCR_MAX_WIDTH / img.width)
+            img = img.resize((_OCR_MAX_WIDTH, new_height), Image.Resampling.BILINEAR)
+        return pytesseract.image_to_string(img, config=_OCR_CONFIG).strip()
+
+
+def _save_marked_screenshot(png_bytes, path, max_width=2048):
+    """Write the marked screenshot as-is, or decode/downscale/encode it once if it is too wide."""
+    try:
+        from PIL import Image
+        # Image.open only parses the header, so the common narrow case never decodes pixels
+        with Image.open(io.BytesIO(png_bytes)) as img:
+            if img.width <= max_width:
+                Path(path).write_bytes(png_bytes)
+                return
+            original_size = img.size
+            img.thumbnail((max_width, img.height), Image.Resampling.LANCZOS)
+            img.save(path, format="PNG", compress_level=1)
+            log.debug("Optimized screenshot: %dx%d -> %dx%d", original_size[0], original_size[1], img.width, img.height)
+    except Exception as e:
+        log.warning("Image optimization failed: %s", e)
+        Path(path).write_bytes(png_bytes)
+
+
 def perform_content_action(action: str, payload: str = None) -> str:
     driver = get_driver()
     if not driver:
         return "Error: Browser not open."
 
+    # Same prep as perform_action: drop overlays and leave any iframe an `iframe >> el`
+    # selector switched into, so snaps and the element map describe the top-level page
+    remove_overlays(driver)
+    driver.switch_to.default_content()
+
     if action == "scan":
         # Identify interactive elements
         script = """
@@ -40,7 +110,7 @@ def perform_content_action(action: str, payload: str = None) -> str:
                     var extra = '';
                     if (el.tagName === 'A') extra = ' (' + el.href + ')';
                     
-                    items.push(i + '|' + el.tagName + '|' + text + '|' + selector + '|' + extra);
+                    items.push({i: i, tag: el.tagName, text: text, sel: selector, extra: extra});
                 }
             }
         }
@@ -48,26 +118,23 @@ def perform_content_action(action: str, payload: str = None) -> str:
         """
         items = driver.execute_script(script)
         output = ["Interactive Elements:"]
-        for item in items[:300]: # Increased from 50 to 300
-            idx, tag, text, sel, extra = item.split('|', 4)
-            output.append(f"{idx}. {tag}: {text} -> {sel}{extra}")
+        output.extend(f"{it['i']}. {it['tag']}: {it['text']} -> {it['sel']}{it['extra']}" for it in items[:300]) # Increased from 50 to 300
         return "\n".join(output)
 
     elif action == "screenshot":
         try:
             timestamp = int(time.time())
             filename = f"screenshot_{timestamp}.png"
-            screenshots_dir = os.path.join(get_workspace_path(), "screenshots")
-            os.makedirs(screenshots_dir, exist_ok=True)
-            path = os.path.join(screenshots_dir, filename)
+            path = os.path.join(_screenshots_dir(), filename)
             driver.save_screenshot(path)
             
             result = f"Screenshot saved: {path}\n\n"
             
             # OCR the screenshot (CPU-based, lightweight)
-            import shutil
-            if shutil.which("tesseract"):
+            if _HAS_TESSERACT:
                 try:
+                    from PIL import Image
+                    import pytesseract
                     img = Image.open(path)
                     text = pytesseract.image_to_string(img)
                     text = text.strip()
@@ -180,128 +247,129 @@ def perform_content_action(action: str, payload: str = None) -> str:
 
 def _perform_snap(driver):
     try:
-        # Ensure screenshots directory exists
-        screenshots_dir = os.path.join(get_workspace_path(), "screenshots")
-        os.makedirs(screenshots_dir, exist_ok=True)
-        
         timestamp = int(time.time())
         filename = f"screenshot_{timestamp}.png"
-        path = os.path.join(screenshots_dir, filename)
+        path = os.path.join(_screenshots_dir(), filename)
         
         # 0. Wait for page load and DOM stability
         try:
-            from selenium.webdriver.support.ui import WebDriverWait
-            # Basic load wait
-            WebDriverWait(driver, 10).until(lambda d: d.execute_script("return document.readyState") == "complete")
-            
-            # Smart DOM stability wait
-            print("[Browser] Waiting for DOM stability...")
-            start_time = time.time()
-            last_count = 0
-            stable_count = 0
-            
-            while time.time() - start_time < 5.0: # Max 5s wait
-                current_count = driver.execute_script("return document.querySelectorAll('*').length")
-                
-                if current_count == last_count:
-                    stable_count += 1
-                else:
-                    stable_count = 0
-                    
-                if stable_count >= 3: # Stable for 3 checks (approx 1.5s)
-                    break
-                    
-                last_count = current_count
-                time.sleep(0.5)
-                
+            # Skip the wait when the page is loaded and unchanged since the last snap
+            ready_state, dom_count, current_url = driver.execute_script(
+                "return [document.readyState, document.querySelectorAll('*').length, location.href]"
+            )
+            page_unchanged = (
+                ready_state == "complete"
+                and current_url == core._last_dom_url
+                and dom_count == core._last_dom_count
+            )
         except Exception as e:
-            print(f"[Browser] Warning: DOM wait failed: {e}")
+            log.debug("DOM idle probe failed: %r", e)
+            page_unchanged = False
+
+        if page_unchanged:
+            log.debug("Page unchanged since last snap, skipping DOM stability wait")
+        else:
+            # Load wait (<=10s), then a structural-quiet wait capped at 5s like the old
+            # node-count loop. childList-only so attribute animations can't hold the snap.
+            wait_page_ready(driver, max_ms=10000)
+            log.debug("Waiting for DOM stability...")
+            wait_dom_stable(driver, max_ms=5000, quiet_ms=500, child_list_only=True)
 
         # 1. Take CLEAN screenshot for OCR (before markers)
         clean_path = path.replace(".png", "_clean.png")
-        driver.save_screenshot(clean_path)
+        clean_png_bytes = driver.get_screenshot_as_png()
+        clean_write = _IO_POOL.submit(Path(clean_path).write_bytes, clean_png_bytes)
+
+        # Start OCR on the in-memory clean screenshot now; it overlaps with marking and cleanup
+        ocr_future = _OCR_POOL.submit(_ocr_image, io.BytesIO(clean_png_bytes)) if _HAS_TESSERACT else None
 
         # 2. Load and execute Set-of-Marks JavaScript
         som_js_path = os.path.join(os.path.dirname(__file__), 'browser_som.js')
         with open(som_js_path, 'r') as f:
             mark_script = f.read()
 
-        # Execute marking script with retry logic
-        max_retries = 10
-        elements_data = []
+        # Mark elements; if none are found yet, the script re-marks in-browser on DOM
+        # mutations for up to 10s instead of being re-sent from Python
+        log.debug("Waiting for page to load interactive elements...")
+        result_data = driver.execute_async_script(
+            mark_script + "\nmarkWithRetry(10000).then(arguments[arguments.length - 1]);"
+        )
         
-        print("[Browser] Waiting for page to load interactive elements...")
-        for attempt in range(max_retries):
-            result_data = driver.execute_script(mark_script)
-            
-            # Handle new object format with debug info
-            if isinstance(result_data, dict) and 'items' in result_data:
-                elements_data = result_data['items']
-                debug_info = result_data.get('debug', {})
-                print(f"[Browser] SoM Debug: Viewport {debug_info.get('viewport')}, Candidates {debug_info.get('totalCandidates')}, Processed {debug_info.get('processed')}, Filtered {debug_info.get('filtered')}")
-            else:
-                # Fallback for old format (list)
-                elements_data = result_data
-            
-            if elements_data and len(elements_data) > 0:
-                break
-            
-            time.sleep(1)
+        # Handle new object format with debug info
+        if isinstance(result_data, dict) and 'items' in result_data:
+            elements_data = result_data['items']
+            debug_info = result_data.get('debug', {})
+            log.debug(
+                "SoM Debug: Viewport %s, Candidates %s, Processed %s, Filtered %s",
+                debug_info.get('viewport'), debug_info.get('totalCandidates'),
+                debug_info.get('processed'), debug_info.get('filtered'),
+            )
+        else:
+            # Fallback for old format (list)
+            elements_data = result_data
         
         # Wait a split second for rendering markers
         time.sleep(0.5)
         
-        # 3. Take MARKED Screenshot (for Vision)
-        driver.save_screenshot(path)
-        
-        # Optimize Image for Vision (Resize if too large)
-        try:
-            img = Image.open(path)
-            max_width = 2048
-            if img.width > max_width:
-                ratio = max_width / img.width
-                new_height = int(img.height * ratio)
-                img = img.resize((max_width, new_height), Image.Resampling.LANCZOS)
-                img.save(path)
-                print(f"[Browser] Optimized screenshot: {img.width}x{img.height} -> {max_width}x{new_height}")
-        except Exception as e:
-            print(f"[Browser] Image optimization failed: {e}")
+        # 3. Take MARKED Screenshot (for Vision), resized and saved in the background
+        marked_write = _IO_POOL.submit(_save_marked_screenshot, driver.get_screenshot_as_png(), path)
         
-        # 4. Remove markers
-        cleanup_script = "var c = document.getElementById('agent-som-container'); if(c) c.remove();"
-        driver.execute_script(cleanup_script)
+        # 4. Remove markers and read scroll status + URL in a single round-trip
+        cleanup_script = """
+        var c = document.getElementById('agent-som-container'); if(c) c.remove();
+        return {
+            scrollTop: window.scrollY,
+            scrollHeight: document.documentElement.scrollHeight,
+            clientHeight: document.documentElement.clientHeight,
+            domCount: document.querySelectorAll('*').length,
+            url: location.href
+        };
+        """
+        page_state = driver.execute_script(cleanup_script) or {}
         
         # 5. Process Data
-        element_map = {}
-        if elements_data:
-            for item in elements_data:
-                try:
-                    # Ensure ID is an integer for compatibility with actions.py
-                    elem_id = int(item['id'])
-                    element_map[elem_id] = item
-                except ValueError:
-                    pass # Skip items with non-integer IDs
+        # Integer IDs for compatibility with actions.py; items with non-integer IDs are skipped.
+        # The map lives in core and is refilled in place rather than replaced.
+        element_map = core._element_map
+        element_map.clear()
+        element_map.update({
+            int(item['id']): item
+            for item in (elements_data or [])
+            if str(item.get('id', '')).lstrip('-').isdigit()
+        })
         
-        # Cache element map in core module
-        core._element_map = element_map
-        core._last_scan_url = driver.current_url
+        # Cache scan URL and DOM fingerprint in core module
+        core._last_scan_url = page_state.get('url')
+        core._last_dom_url = page_state.get('url')
+        core._last_dom_count = page_state.get('domCount')
         
-        print(f"[Browser] Updated element map with {len(element_map)} items")
+        log.debug("Updated element map with %d items", len(element_map))
         
         result = f"Marked screenshot saved: {path}\n\n"
         
-        # 6. OCR of CLEAN Viewport
-        import shutil
-        if shutil.which("tesseract"):
+        # 6. Scroll Status (formatted before waiting on OCR so both overlap)
+        try:
+            scrollTop = page_state['scrollTop']
+            scrollHeight = page_state['scrollHeight']
+            clientHeight = page_state['clientHeight']
+            
+            if scrollHeight > clientHeight:
+                percentage = int((scrollTop / (scrollHeight - clientHeight)) * 100)
+                scroll_status = f"Scroll: {percentage}% (View: {scrollTop}-{scrollTop+clientHeight} / Total: {scrollHeight})\n"
+            else:
+                scroll_status = "Scroll: 100% (Single Page)\n"
+        except Exception as e:
+            log.debug("Scroll status failed: %r", e)
+            scroll_status = "Scroll: Unknown\n"
+
+        # 7. OCR of CLEAN Viewport
+        if ocr_future is not None:
             try:
-                # Use clean_path for OCR
-                with Image.open(clean_path) as img:
-                    text = pytesseract.image_to_string(img)
-                    text = text.strip()
-                    if text:
-                        result += f"Viewport Text (OCR):\n{text[:2000]}" + ("...\n" if len(text) > 2000 else "\n")
-                    else:
-                        result += "(No text detected via OCR)\n"
+                text = ocr_future.result(timeout=10)
+                if text:
+                    result += f"Viewport Text (OCR):\n{text[:2000]}" + ("...\n" if len(text) > 2000 else "\n")
+                else:
+                    result += "(No text detected via OCR)\n"
                 
                 # Cleanup clean screenshot - SKIPPED for dual-image strategy
                 # try:
@@ -313,29 +381,7 @@ def _perform_snap(driver):
         else:
             result += "(OCR skipped: 'tesseract' binary not found)\n"
 
-        # Element summary
-
-        # Scroll Status
-        try:
-            scroll_script = """
-            return JSON.stringify({
-                scrollTop: window.scrollY,
-                scrollHeight: document.documentElement.scrollHeight,
-                clientHeight: document.documentElement.clientHeight
-            });
-            """
-            scroll_info = json.loads(driver.execute_script(scroll_script))
-            scrollTop = scroll_info['scrollTop']
-            scrollHeight = scroll_info['scrollHeight']
-            clientHeight = scroll_info['clientHeight']
-            
-            if scrollHeight > clientHeight:
-                percentage = int((scrollTop / (scrollHeight - clientHeight)) * 100)
-                result += f"Scroll: {percentage}% (View: {scrollTop}-{scrollTop+clientHeight} / Total: {scrollHeight})\n"
-            else:
-                result += "Scroll: 100% (Single Page)\n"
-        except:
-            result += "Scroll: Unknown\n"
+        result += scroll_status
 
         # Element summary
         result += f"\n\nInteractive Elements (Total: {len(element_map)}):\n"
@@ -350,10 +396,13 @@ def _perform_snap(driver):
         
         result += "\nUse 'click' with a number (e.g., 'click 5') to interact with marked elements.\n"
         
+        # Callers read both files right away, so the writes must have landed
+        clean_write.result()
+        marked_write.result()
+        
         return clean_path, path, result
         
     except Exception as e:
-        print(f"[Browser] CRITICAL SNAP ERROR: {e}")
-        import traceback
-        traceback.print_exc()
+        log.warning("CRITICAL SNAP ERROR: %s", e)
+        log.exception("snap failed")
         return "", "", f"Error creating marked screenshot: {e}"
@@ -3,24 +3,33 @@ Browser Core - Driver Management
 Handles browser lifecycle: open, close, driver access
 """
 import os
+import glob
+import logging
 import time
 import shutil
-from selenium import webdriver
-from selenium.webdriver.firefox.service import Service
-from selenium.webdriver.firefox.options import Options
-from webdriver_manager.firefox import GeckoDriverManager
+from collections import deque
+from pathlib import Path
 from ...safety import get_workspace_path
 
 from .config import BrowserConfig
 
+log = logging.getLogger(__name__)
+
 # Global driver instance
 _driver = None
 
+# Resolved geckodriver binary, reused across browser restarts
+_geckodriver_path_cache = None
+
 # Global element map for Set-of-Marks (SoM)
 _element_map = {}
 _last_scan_url = None
+# DOM fingerprint (node count + URL) at the end of the last successful snap
+_last_dom_count = None
+_last_dom_url = None
 _browser_context_lines = 0
-_url_log = [] # List of {"url": str, "title": str, "timestamp": float}
+# Bounded history of {"url": str, "title": str, "timestamp": float}
+_url_log = deque(maxlen=int(os.getenv("BROWSER_URL_LOG_MAX", 5000)))
 
 def log_url(url, title=""):
     """Logs a visited URL."""
@@ -36,13 +45,59 @@ def log_url(url, title=""):
 
 def get_url_log():
     global _url_log
-    return _url_log
+    return list(_url_log)
 
 
 def get_profile_path():
     return BrowserConfig.PROFILE_PATH
 
 
+# Profile entries that are never cloned, at any depth: lock files, the SQLite shared-memory
+# index (rebuilt on open) and caches Firefox rebuilds. *.sqlite-wal is kept: with real
+# copies it holds committed rows (e.g. fresh login cookies) not yet checkpointed.
+_PROFILE_CLONE_IGNORE = shutil.ignore_patterns(
+    "lock", ".parentlock", "parent.lock",
+    "*.sqlite-shm",
+    "cache2", "startupCache",
+)
+
+
+def _prune_ignored(root):
+    """Remove nested entries matching _PROFILE_CLONE_IGNORE (cp -r can only skip top-level ones)."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        skipped = _PROFILE_CLONE_IGNORE(dirpath, dirnames + filenames)
+        for name in skipped:
+            path = os.path.join(dirpath, name)
+            if os.path.isdir(path) and not os.path.islink(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                Path(path).unlink(missing_ok=True)
+        dirnames[:] = [d for d in dirnames if d not in skipped]
+
+
+def _fast_clone(src, dst):
+    """
+    Clone a Firefox profile directory.
+    Uses `cp --reflink=auto` (copy-on-write on btrfs/xfs, plain copy elsewhere)
+    and falls back to shutil.copytree when GNU cp is unavailable.
+    """
+    import subprocess
+    entries = os.listdir(src)
+    skipped = _PROFILE_CLONE_IGNORE(src, entries)
+    sources = [os.path.join(src, name) for name in entries if name not in skipped]
+    
+    os.makedirs(dst, exist_ok=True)
+    try:
+        if sources:
+            subprocess.run(["cp", "--reflink=auto", "-r", *sources, dst], check=True, stderr=subprocess.DEVNULL)
+            _prune_ignored(dst)
+        return
+    except (OSError, subprocess.CalledProcessError):
+        shutil.rmtree(dst, ignore_errors=True)
+    
+    shutil.copytree(src, dst, ignore=_PROFILE_CLONE_IGNORE)
+
+
 def force_cleanup():
     """Kills stale browser and driver processes safely."""
     global _driver
@@ -78,7 +133,7 @@ def set_context_lines(lines):
 
 
 def open_browser(url=None):
-    global _driver
+    global _driver, _geckodriver_path_cache
     
     # Check if driver is actually alive
     if _driver is not None:
@@ -88,7 +143,8 @@ def open_browser(url=None):
                 _driver.get(url)
                 return f"Browser already open. Navigated to {url}"
             return "Browser already open."
-        except:
+        except Exception as e:
+            log.debug("Existing driver is dead, restarting: %r", e)
             _driver = None  # It's dead, proceed to restart
 
     # Always force cleanup to ensure no zombie processes prevent startup
@@ -99,24 +155,29 @@ def open_browser(url=None):
         original_profile = get_profile_path()
         profile_path = BrowserConfig.get_temp_profile_path()
         
-        if os.path.exists(profile_path):
-            shutil.rmtree(profile_path)
+        shutil.rmtree(profile_path, ignore_errors=True)
 
         try:
             if os.path.exists(original_profile):
-                shutil.copytree(original_profile, profile_path, ignore=shutil.ignore_patterns("lock", ".parentlock", "parent.lock"))
+                _fast_clone(original_profile, profile_path)
             else:
                 os.makedirs(profile_path, exist_ok=True)
-        except:
-            pass
+        except Exception as e:
+            log.debug("Profile clone failed: %r", e)
         
         # Cleanup locks
-        for lock in ["lock", ".parentlock", "parent.lock"]:
+        for lock in ("lock", ".parentlock", "parent.lock"):
             try:
-                os.remove(os.path.join(profile_path, lock))
-            except:
-                pass
+                Path(profile_path, lock).unlink(missing_ok=True)
+            except OSError as e:
+                log.debug("Lock removal failed: %r", e)
 
+        # Imported here to keep core itself selenium-free. The package as a whole still loads
+        # selenium at import: navigation, helpers and actions_impl import it at module level.
+        from selenium import webdriver
+        from selenium.webdriver.firefox.service import Service
+        from selenium.webdriver.firefox.options import Options
+        
         options = Options()
         options.binary_location = BrowserConfig.BINARY_LOCATION
         options.add_argument("-profile")
@@ -124,8 +185,7 @@ def open_browser(url=None):
         
         # Configure download directory
         download_dir = BrowserConfig.DOWNLOAD_DIR
-        if not os.path.exists(download_dir):
-            os.makedirs(download_dir)
+        os.makedirs(download_dir, exist_ok=True)
             
         options.set_preference("browser.download.folderList", 2)
         options.set_preference("browser.download.dir", download_dir)
@@ -139,29 +199,40 @@ def open_browser(url=None):
         options.set_preference('useAutomationExtension', False)
         options.set_preference("general.useragent.override", "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
         
-        # Use cached geckodriver to avoid GitHub API rate limits
-        geckodriver_path = None
-        wdm_cache = os.path.expanduser("~/.wdm/drivers/geckodriver")
-        
-        # Search for cached geckodriver
-        if os.path.exists(wdm_cache):
-            for root, dirs, files in os.walk(wdm_cache):
-                if "geckodriver" in files:
-                    geckodriver_path = os.path.join(root, "geckodriver")
-                    break
-        
-        # Fall back to system path
-        if not geckodriver_path:
-            geckodriver_path = shutil.which("geckodriver")
+        # Use cached geckodriver to avoid GitHub API rate limits; re-resolve if the binary
+        # vanished (e.g. webdriver_manager upgraded or cleaned ~/.wdm)
+        geckodriver_path = _geckodriver_path_cache
+        if geckodriver_path is not None and not os.path.isfile(geckodriver_path):
+            geckodriver_path = None
+        if geckodriver_path is None:
+            wdm_cache = os.path.expanduser("~/.wdm/drivers/geckodriver")
+            
+            # Search for cached geckodriver (first regular file; stops walking at the first hit)
+            geckodriver_path = next(
+                (p for p in glob.iglob(os.path.join(wdm_cache, "**", "geckodriver"), recursive=True)
+                 if os.path.isfile(p)),
+                None
+            )
+            
+            # Fall back to system path
+            if not geckodriver_path:
+                geckodriver_path = shutil.which("geckodriver")
 
-        # Fall back to manager if no cache found
-        if not geckodriver_path:
-            geckodriver_path = GeckoDriverManager().install()
+            # Fall back to manager if no cache found
+            if not geckodriver_path:
+                from webdriver_manager.firefox import GeckoDriverManager
+                geckodriver_path = GeckoDriverManager().install()
+            
+            _geckodriver_path_cache = geckodriver_path
         
         service = Service(geckodriver_path)
         _driver = webdriver.Firefox(service=service, options=options)
         _driver.set_page_load_timeout(BrowserConfig.PAGE_LOAD_TIMEOUT)
         
+        # Stamp window.__lastMut in every new document so DOM-stable waits are a single read
+        from .helpers import install_dom_observer
+        install_dom_observer(_driver)
+        
         # NOTE: selenium-stealth only supports Chrome. Firefox stealth is handled via preferences above.
         # The dom.webdriver.enabled=False preference is the Firefox equivalent.
         
@@ -182,8 +253,8 @@ def close_browser():
     if _driver:
         try:
             _driver.quit()
-        except:
-            pass
+        except Exception as e:
+            log.debug("Driver quit failed: %r", e)
         _driver = None
         return "Browser closed."
     return "Browser not open."
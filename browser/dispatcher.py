@@ -3,45 +3,87 @@ Browser Action Dispatcher
 Aggregates actions from different modules into a single interface.
 """
 from .core import get_driver, open_browser, close_browser, force_cleanup
-from .actions import perform_action as do_action
-from .navigation import perform_navigation as do_navigation
-from .content import perform_content_action as do_content
+from .actions import perform_action as do_action, SUPPORTED_ACTIONS as ACTION_ACTIONS
+from .navigation import perform_navigation as do_navigation, SUPPORTED_ACTIONS as NAVIGATION_ACTIONS
+from .content import perform_content_action as do_content, SUPPORTED_ACTIONS as CONTENT_ACTIONS
+from .helpers import wait_page_ready
+
+
+# Actions that manage the session themselves and never trigger an auto-restart
+_SESSION_ACTIONS = frozenset({"open", "close", "nuke"})
+
+
+def _restart_lost_session(action):
+    """
+    Auto-restart if the session is lost and the action requires a browser.
+    Returns a message to hand back instead of running the action, or None to proceed.
+    """
+    restart_res = open_browser()
+    if not get_driver():
+        return f"Error: Browser session was lost and failed to restart. Reason: {restart_res}"
+    # A visit works fine on the fresh blank page; anything else targeted the lost page
+    if action == "visit":
+        return None
+    return "Browser session was lost and has been restarted (fresh state). Please retry your command."
+
+
+def _bind(handler, action):
+    return lambda payload: handler(action, payload)
+
+
+def _do_and_snap(payload):
+    """
+    Run an action, wait in-browser for the page to settle, then snap.
+    Payload: {"action": str, "payload": any}. Returns "<action result>\n\n<snap>".
+    """
+    if not isinstance(payload, dict) or not payload.get("action"):
+        return "Error: do_and_snap requires {'action': ..., 'payload': ...}."
+    result = browser_automation(payload["action"], payload.get("payload"))
+    driver = get_driver()
+    if driver:
+        wait_page_ready(driver)
+    snap = browser_automation("snap")
+    return f"{result}\n\n{snap}"
+
+
+def _build_table():
+    """
+    Map every action name to its handler.
+    Later entries win, preserving the old try-each-module precedence:
+    core > navigation > actions > content.
+    """
+    table = {}
+    for handler, actions in (
+        (do_content, CONTENT_ACTIONS),
+        (do_action, ACTION_ACTIONS),
+        (do_navigation, NAVIGATION_ACTIONS),
+    ):
+        for action in actions:
+            table[action] = _bind(handler, action)
+    
+    # Core actions
+    table["open"] = lambda payload: open_browser(url=payload)
+    table["close"] = lambda payload: close_browser()
+    table["nuke"] = lambda payload: force_cleanup()
+    
+    # Composite actions
+    table["do_and_snap"] = _do_and_snap
+    return table
+
+
+_TABLE = _build_table()
+
 
 def browser_automation(action: str, payload: str = None) -> str:
     """
     Low-level browser control.
     Dispatches commands to appropriate modules.
     """
-    # Core actions
-    if action == "open":
-        return open_browser(url=payload)
-    elif action == "close":
-        return close_browser()
-    elif action == "nuke":
-        return force_cleanup()
-    
-    # Check if driver is alive for other actions
-    driver = get_driver()
-    if not driver:
-         # Auto-restart if session is lost and action requires browser
-         # This logic is also in individual modules but good to have here as a catch-all check
-         # or we can let modules handle it.
-         # For "open" it's handled above.
-         pass
-
-    # Try Navigation
-    res = do_navigation(action, payload)
-    if res is not None:
-        return res
-        
-    # Try Actions
-    res = do_action(action, payload)
-    if res is not None:
-        return res
-        
-    # Try Content
-    res = do_content(action, payload)
-    if res is not None:
-        return res
-        
-    return f"Unknown action: {action}"
+    handler = _TABLE.get(action)
+    if handler is None:
+        return f"Unknown action: {action}"
+    if action not in _SESSION_ACTIONS and not get_driver():
+        restart_msg = _restart_lost_session(action)
+        if restart_msg is not None:
+            return restart_msg
+    return handler(payload)
@@ -2,12 +2,172 @@
 Helper functions for browser automation
 Includes CAPTCHA detection and human-like interactions
 """
+import re
 import time
 import random
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.action_chains import ActionChains
 from .core import _driver, get_driver
 
+# Resolved once at import; notifications are optional for CAPTCHA handling
+try:
+    from ..notify import send_notification
+except Exception:
+    send_notification = None
+
+# One reusable ActionChains for the current driver. ActionChains holds strong references to
+# its driver, so keep a single pair and replace it when the driver changes (a restart)
+# instead of caching per driver.
+_ACTION_CACHE = {'driver': None, 'chain': None}
+
+
+def _action_chain(driver):
+    """Return the cached ActionChains for driver with any leftover queued actions dropped."""
+    action = _ACTION_CACHE['chain']
+    if action is None or _ACTION_CACHE['driver'] is not driver:
+        action = ActionChains(driver)
+        _ACTION_CACHE['driver'] = driver
+        _ACTION_CACHE['chain'] = action
+    else:
+        # Clear the local queues only; reset_actions() would also cost a WebDriver round-trip
+        for device in action.w3c_actions.devices:
+            device.clear_actions()
+    return action
+
+
+# Cloudflare / Turnstile challenge iframes
+_CF_IFRAME_SELECTOR = "iframe[src*='turnstile'], iframe[src*='cloudflare'], iframe[src*='challenge'], iframe[name^='cf-']"
+
+# Fallback: [src, name, element] for every iframe in one round-trip
+_IFRAME_META_JS = "return Array.from(document.querySelectorAll('iframe')).map(function (f) { return [f.src, f.name, f]; });"
+
+# Title/URL markers of an unresolved challenge, matched in a single pass
+_CAPTCHA_RESIDUAL = re.compile(
+    r"sorry|captcha|just a moment|attention required|verify you are human|cloudflare|challenge-platform|cdn-cgi/challenge"
+)
+
+# Cheap in-page probe: title, URL, then flags for challenge widgets and challenge phrases
+# in the first 4KB of visible text. One round-trip instead of shipping the page source over.
+_CAPTCHA_STATE_JS = """
+var t = ((document.body && document.body.innerText) || '').slice(0, 4096).toLowerCase();
+return [
+    document.title,
+    location.href,
+    !!document.querySelector('.cf-turnstile, #challenge-form, iframe[src*="turnstile"]'),
+    t.includes('verify you are human'),
+    t.includes('unusual traffic'),
+    t.includes('captcha')
+];
+"""
+
+
+def _wait_for_captcha_resolution(driver, max_wait=30):
+    """
+    Poll with exponential backoff until the challenge is gone or max_wait seconds pass.
+    Returns True if the page looks resolved.
+    """
+    start_wait = time.time()
+    delay = 0.5
+    while time.time() - start_wait < max_wait:
+        time.sleep(delay)
+        delay = min(delay * 1.5, 5.0)
+        try:
+            curr_title, curr_url, *challenge_flags = driver.execute_script(_CAPTCHA_STATE_JS)
+        except Exception:
+            continue
+        if any(challenge_flags):
+            continue
+        if _CAPTCHA_RESIDUAL.search(f"{curr_title}\n{curr_url}".lower()):
+            continue
+        return True
+    return False
+
+
+# Async poll: resolves once document.readyState is complete, or after arguments[0] ms.
+# readyState only: in-flight XHR/fetch is not tracked (the snap's DOM-stable wait covers
+# content that arrives after load)
+_PAGE_READY_JS = """
+var maxMs = arguments[0];
+var done = arguments[arguments.length - 1];
+var t0 = Date.now();
+(function poll() {
+    if (document.readyState === 'complete' || Date.now() - t0 > maxMs) return done();
+    setTimeout(poll, 50);
+})();
+"""
+
+
+def wait_page_ready(driver, max_ms=3000):
+    """Wait (in-browser, one WebDriver call) until document.readyState is complete."""
+    try:
+        driver.execute_async_script(_PAGE_READY_JS, max_ms)
+    except Exception as e:
+        # Navigation can tear down the script's document mid-poll; the snap waits again anyway
+        print(f"[Browser] Page-ready wait interrupted: {e}")
+
+
+# Stamps window.__lastMut on every DOM mutation and window.__lastChildMut only when nodes
+# are added/removed (attribute churn from animations doesn't touch it); idempotent per
+# document. Observes `document` itself so it also works when injected before <html> exists.
+_MUT_OBSERVER_JS = """
+if (!window.__agentMutObserver) {
+    window.__lastMut = window.__lastChildMut = performance.now();
+    window.__agentMutObserver = new MutationObserver(function (records) {
+        var now = performance.now();
+        window.__lastMut = now;
+        for (var i = 0; i < records.length; i++) {
+            if (records[i].type === 'childList') { window.__lastChildMut = now; break; }
+        }
+    });
+    window.__agentMutObserver.observe(document, {subtree: true, childList: true, attributes: true});
+}
+"""
+
+# Async poll: resolves once the document is complete and the DOM has been quiet for
+# arguments[1] ms, or after arguments[0] ms; arguments[2] picks the stamp to watch
+# (childList-only when true). The observer above is installed on first use if the tab
+# did not get it at document creation, so each poll is a number comparison.
+_DOM_STABLE_JS = """
+var maxMs = arguments[0], quietMs = arguments[1], childListOnly = arguments[2];
+var done = arguments[arguments.length - 1];
+""" + _MUT_OBSERVER_JS + """
+var t0 = performance.now();
+(function poll() {
+    var now = performance.now();
+    var last = childListOnly ? window.__lastChildMut : window.__lastMut;
+    if ((document.readyState === 'complete' && now - last >= quietMs) || now - t0 >= maxMs) return done();
+    setTimeout(poll, 50);
+})();
+"""
+
+
+def install_dom_observer(driver):
+    """
+    Register the mutation observer for every new document in the tab (CDP drivers only).
+    Firefox has no Page.addScriptToEvaluateOnNewDocument; wait_dom_stable installs it lazily there.
+    """
+    if not hasattr(driver, "execute_cdp_cmd"):
+        return False
+    try:
+        driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": _MUT_OBSERVER_JS})
+        return True
+    except Exception as e:
+        print(f"[Browser] Could not register DOM observer: {e}")
+        return False
+
+
+def wait_dom_stable(driver, max_ms=1500, quiet_ms=300, child_list_only=False):
+    """
+    Wait until the DOM stops changing (or max_ms passes) in a single WebDriver call.
+    child_list_only ignores attribute-only mutations (animations, progress bars).
+    """
+    if not driver:
+        return
+    try:
+        driver.execute_async_script(_DOM_STABLE_JS, max_ms, quiet_ms, child_list_only)
+    except Exception as e:
+        print(f"[Browser] DOM-stable wait interrupted: {e}")
+
 
 def handle_manual_captcha():
     """
@@ -29,15 +189,17 @@ def handle_manual_captcha():
         
         print(">> Attempting to click Cloudflare checkbox (if present)...")
         try:
-            # 1. Find the iframe
-            iframes = driver.find_elements(By.TAG_NAME, "iframe")
-            cf_frame = None
-            for frame in iframes:
-                src = frame.get_attribute("src") or ""
-                name = frame.get_attribute("name") or ""
-                if "turnstile" in src or "cloudflare" in src or "challenge" in src or name.startswith("cf-"):
-                    cf_frame = frame
-                    break
+            # 1. Find the iframe (filtered by the browser in a single query)
+            cf_frames = driver.find_elements(By.CSS_SELECTOR, _CF_IFRAME_SELECTOR)
+            cf_frame = cf_frames[0] if cf_frames else None
+            if cf_frame is None:
+                # Dynamic frames may not match attribute selectors; read every frame's
+                # src/name (plus the element itself) in one call and filter here
+                for src, name, frame in driver.execute_script(_IFRAME_META_JS) or []:
+                    src, name = src or "", name or ""
+                    if "turnstile" in src or "cloudflare" in src or "challenge" in src or name.startswith("cf-"):
+                        cf_frame = frame
+                        break
             
             if cf_frame:
                 # Switch to iframe
@@ -53,7 +215,7 @@ def handle_manual_captcha():
                     try:
                         body = driver.find_element(By.TAG_NAME, "body")
                         # Click slightly offset from center to look human
-                        action = ActionChains(driver)
+                        action = _action_chain(driver)
                         action.move_to_element_with_offset(body, 10, 10).click().perform()
                     except:
                         pass
@@ -73,14 +235,14 @@ def handle_manual_captcha():
         print(">> Please switch to the browser window and solve it!")
         
         # Send desktop notification
-        try:
-            from ..notify import send_notification
-            send_notification(
-                f"[Browser Agent] CAPTCHA Detected! Please solve it.",
-                urgency="critical"
-            )
-        except Exception as e:
-            print(f"Notification error: {e}")
+        if send_notification:
+            try:
+                send_notification(
+                    f"[Browser Agent] CAPTCHA Detected! Please solve it.",
+                    urgency="critical"
+                )
+            except Exception as e:
+                print(f"Notification error: {e}")
         
         print("Waiting for CAPTCHA resolution...")
         
@@ -90,11 +252,13 @@ def handle_manual_captcha():
             print("[+] Resuming automation...")
             time.sleep(2)
         except EOFError:
-            print("[-] No terminal input available. Waiting 30 seconds...")
-            time.sleep(30)
+            print("[-] No terminal input available. Waiting up to 30 seconds for resolution...")
+            if _wait_for_captcha_resolution(driver):
+                print("[+] CAPTCHA appears resolved. Resuming automation...")
         except Exception as e:
-            print(f"[-] Input error: {e}. Waiting 30 seconds...")
-            time.sleep(30)
+            print(f"[-] Input error: {e}. Waiting up to 30 seconds for resolution...")
+            if _wait_for_captcha_resolution(driver):
+                print("[+] CAPTCHA appears resolved. Resuming automation...")
             
     except Exception as e:
         print(f"Error handling CAPTCHA: {e}")
@@ -104,18 +268,17 @@ def human_click(element):
     """Human-like click with smooth scrolling and randomized timing"""
     driver = get_driver()
     try:
-        # Scroll to element first
-        driver.execute_script("arguments[0].scrollIntoView({behavior: 'smooth', block: 'center'});", element)
+        # Scroll to element and explicitly focus it (helps with SPAs like Spotify) in one call;
+        # a failing focus() must not skip the click
+        driver.execute_script(
+            "arguments[0].scrollIntoView({behavior: 'smooth', block: 'center'});"
+            "try { arguments[0].focus(); } catch (e) {}",
+            element,
+        )
         time.sleep(random.uniform(0.3, 0.7))  # Human-like scroll delay
-        
-        # Explicitly focus the element (helps with SPAs like Spotify)
-        try:
-            driver.execute_script("arguments[0].focus();", element)
-        except:
-            pass
 
         # Human-like click
-        action = ActionChains(driver)
+        action = _action_chain(driver)
         action.move_to_element(element)
         action.pause(random.uniform(0.1, 0.3))  # Hover
         action.click()
@@ -136,9 +299,75 @@ def human_click(element):
                 return False
 
 
-def human_type(element, text):
-    """Human-like typing with randomized keystroke timing"""
+# Focus arguments[0] and report whether it actually holds focus now
+_FOCUS_JS = "arguments[0].focus(); return document.activeElement === arguments[0];"
+
+
+def _insert_text_cdp(driver, element, text):
+    """
+    Focus element, then type into it with one CDP Input.insertText per word.
+    Only Chromium drivers expose CDP; returns False when it is unavailable, the element
+    can't take focus (insertText would land in whatever else is focused) or typing fails.
+    """
+    if not hasattr(driver, "execute_cdp_cmd"):
+        return False
+    try:
+        if not driver.execute_script(_FOCUS_JS, element):
+            return False
+        chunks = text.split(" ")
+        for i, chunk in enumerate(chunks):
+            if i < len(chunks) - 1:
+                chunk += " "
+            if chunk:
+                driver.execute_cdp_cmd("Input.insertText", {"text": chunk})
+            # Human-like pause between words instead of between keystrokes
+            time.sleep(random.uniform(0.05, 0.15))
+        return True
+    except Exception as e:
+        print(f"CDP insertText failed, falling back to send_keys: {e}")
+        return False
+
+
+# Splits typed text into words, whitespace runs and punctuation (kept as separate chunks)
+_TYPE_CHUNK_RE = re.compile(r"(\s+|[.,!?])")
+
+# Sets an input's value in one call and fires input/change so frameworks notice.
+# Uses the prototype setter so React-style controlled inputs pick up the value.
+# Declines (returns false) for non-text fields and for password/email inputs,
+# where sites may inspect keystroke cadence.
+_FAST_TYPE_JS = """
+var el = arguments[0], text = arguments[1];
+var tag = el.tagName;
+if (tag === 'INPUT') {
+    var type = (el.getAttribute('type') || '').toLowerCase();
+    if (['', 'text', 'search', 'url', 'tel'].indexOf(type) < 0) return false;
+} else if (tag !== 'TEXTAREA') {
+    return false;
+}
+var proto = tag === 'INPUT' ? HTMLInputElement.prototype : HTMLTextAreaElement.prototype;
+el.focus();
+Object.getOwnPropertyDescriptor(proto, 'value').set.call(el, text);
+el.dispatchEvent(new Event('input', {bubbles: true}));
+el.dispatchEvent(new Event('change', {bubbles: true}));
+return el.value === text;
+"""
+
+
+def human_type(element, text, fast=True):
+    """
+    Human-like typing with randomized keystroke timing.
+    With fast=True, text-like inputs (text/search/url/tel) and textareas are filled in a
+    single JS call; every other target (password, email, number, contenteditable, ...)
+    still gets real keystrokes.
+    """
     driver = get_driver()
+    if fast:
+        try:
+            time.sleep(random.uniform(0.1, 0.3))  # Single humanizing pause
+            if driver.execute_script(_FAST_TYPE_JS, element, text):
+                return True
+        except Exception as e:
+            print(f"Fast type failed, falling back to keystrokes: {e}")
     try:
         # Check visibility/size
         is_visible = element.is_displayed() and element.size['width'] > 0 and element.size['height'] > 0
@@ -162,10 +391,12 @@ def human_type(element, text):
             # But mostly just type
             pass
         
-        for char in text:
-            element.send_keys(char)
-            # Random delay between keystrokes (30ms to 100ms)
-            time.sleep(random.uniform(0.03, 0.1))
+        if not _insert_text_cdp(driver, element, text):
+            # One send_keys per word/whitespace/punctuation run; jitter only at those boundaries
+            for chunk in _TYPE_CHUNK_RE.split(text):
+                if chunk:
+                    element.send_keys(chunk)
+                    time.sleep(random.uniform(0.03, 0.08))
         
         # Add small delay after typing to ensure text is registered
         time.sleep(0.3)
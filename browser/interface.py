@@ -2,12 +2,16 @@
 Browser High-Level Interface
 Handles JSON action sequences and session commands.
 """
-import time
+import re
 import json
 from .core import get_driver
 from .dispatcher import browser_automation
 from .autonomous import autonomous_browser
-from .helpers import human_click
+from .helpers import human_click, wait_dom_stable
+
+# Heuristic for "looks like a URL", checked in a single regex pass
+_URL_RE = re.compile(r"https?://|www\.|\.(com|org|net|io)(\b|/)")
+is_url = _URL_RE.search
 
 def browser(goal: str, mode: str = "normal_research") -> str:
     """
@@ -22,40 +26,57 @@ def browser(goal: str, mode: str = "normal_research") -> str:
         goal (str): The objective to achieve.
         mode (str): "normal_research" (default).
     """
+    driver = get_driver()
     
     # Mode 1: JSON Action Sequence
     if goal.strip().startswith('{'):
         print(f"\n[Browser] Detected JSON action sequence. Parsing...")
         
         # Ensure browser is open first
-        if not get_driver():
+        if not driver:
             print("[Browser] Opening browser...")
             browser_automation("open")
         
-        # Parse and execute each action
+        # Parse all concatenated / newline-separated JSON objects in one pass
         results = []
-        # Split by '}{'  to separate JSON objects
-        action_strings = goal.replace('}{', '}|||{').split('|||')
-        
-        for i, action_str in enumerate(action_strings):
+        commands = []
+        parse_error = None
+        decoder = json.JSONDecoder()
+        text = goal.strip()
+        idx = 0
+        while idx < len(text):
+            try:
+                cmd, idx = decoder.raw_decode(text, idx)
+            except json.JSONDecodeError as e:
+                parse_error = f"{len(commands)+1}. Error parsing action at position {idx}: {e}"
+                break
+            commands.append(cmd)
+            while idx < len(text) and text[idx].isspace():
+                idx += 1
+        
+        for i, cmd in enumerate(commands):
             try:
-                cmd = json.loads(action_str.strip())
                 action = cmd.get("action")
                 payload = cmd.get("payload", "")
                 
-                print(f"\n[Browser] Action {i+1}/{len(action_strings)}: {action.upper()} -> {payload}")
+                print(f"\n[Browser] Action {i+1}/{len(commands)}: {action.upper()} -> {payload}")
                 result = browser_automation(action, payload)
                 print(f"[Browser] Result: {result}")
                 results.append(f"{i+1}. {action}({payload}) -> {result}")
                 
-                # Wait between actions
-                time.sleep(1.5)
+                # Wait for the page to settle between actions
+                wait_dom_stable(get_driver())
                 
             except Exception as e:
-                error_msg = f"{i+1}. Error parsing/executing action '{action_str}': {e}"
+                error_msg = f"{i+1}. Error executing action '{json.dumps(cmd)}': {e}"
                 print(f"[Browser] {error_msg}")
                 results.append(error_msg)
         
+        # Anything after malformed JSON cannot be split reliably, so it is reported and skipped
+        if parse_error:
+            print(f"[Browser] {parse_error}")
+            results.append(parse_error)
+        
         return "\n".join(results)
     
     # Mode 2: Session Commands (NEW)
@@ -67,10 +88,6 @@ def browser(goal: str, mode: str = "normal_research") -> str:
         
         print(f"\n[Browser] Received goal: {goal}")
         
-        # Helper to check if string looks like a URL
-        def is_url(s):
-            return "http" in s or "www." in s or (".com" in s or ".org" in s or ".net" in s or ".io" in s)
-
         # Open/Visit URL
         # Only treat as command if it looks like a URL AND has no spaces (simple command)
         # We calculate potential_url first to check conditions
@@ -78,76 +95,64 @@ def browser(goal: str, mode: str = "normal_research") -> str:
         potential_url = parts[1].strip() if len(parts) > 1 else ""
         is_simple_url = (goal_lower.startswith("open ") or goal_lower.startswith("visit ")) and \
                         " " not in potential_url and \
-                        is_url(potential_url)
+                        is_url(potential_url) is not None
 
         if is_simple_url:
             # Ensure browser is open
-            if not get_driver():
+            if not driver:
                 print("[Browser] Opening new browser instance...")
                 browser_automation("open")
             
             print(f"[Browser] Executing direct navigation to: {potential_url}")
             
             browser_automation("visit", potential_url)
-            time.sleep(2)  # Wait for page load
+            wait_dom_stable(get_driver(), max_ms=2000)  # Wait for page load
             return browser_automation("snap")
         
         # Web Search
         elif goal_lower.startswith("search ") or goal_lower.startswith("google "):
-            if not get_driver():
+            if not driver:
                 browser_automation("open")
             
             query = goal.split(None, 1)[1] if len(goal.split(None, 1)) > 1 else ""
             print(f"[Browser] Executing web search for: {query}")
             
             browser_automation("web_search", query)
-            time.sleep(2)
+            wait_dom_stable(get_driver(), max_ms=2000)
             return browser_automation("snap")
         
         # Click
         elif goal_lower.startswith("click "):
-            if not get_driver():
+            if not driver:
                 return "Error: No browser open. Use 'open <url>' first."
             
             target = goal.split(None, 1)[1] if len(goal.split(None, 1)) > 1 else ""
             print(f"[Browser] Executing click on: {target}")
             
-            result = browser_automation("click", target)
-            time.sleep(1.5)
-            snap = browser_automation("snap")
-            return f"{result}\n\n{snap}"
+            return browser_automation("do_and_snap", {"action": "click", "payload": target})
         
         # Type
         elif goal_lower.startswith("type "):
-            if not get_driver():
+            if not driver:
                 return "Error: No browser open. Use 'open <url>' first."
             
             payload = goal.split(None, 1)[1] if len(goal.split(None, 1)) > 1 else ""
             print(f"[Browser] Executing type: {payload}")
             
-            result = browser_automation("type", payload)
-            time.sleep(0.5)
-            snap = browser_automation("snap")
-            return f"{result}\n\n{snap}"
+            return browser_automation("do_and_snap", {"action": "type", "payload": payload})
         
         # Scroll
         elif goal_lower in ["scroll", "scroll down"]:
             print("[Browser] Scrolling down")
-            browser_automation("scroll")
-            time.sleep(0.5)
-            return browser_automation("snap")
+            return browser_automation("do_and_snap", {"action": "scroll"})
         
         elif goal_lower in ["scroll up", "scroll top"]:
             print("[Browser] Scrolling to top")
-            browser_automation("scroll", "top")
-            time.sleep(0.5)
-            return browser_automation("snap")
+            return browser_automation("do_and_snap", {"action": "scroll", "payload": "top"})
         
         elif goal_lower == "scroll bottom":
             print("[Browser] Scrolling to bottom")
-            browser_automation("scroll", "bottom")
-            time.sleep(0.5)
-            return browser_automation("snap")
+            return browser_automation("do_and_snap", {"action": "scroll", "payload": "bottom"})
         
         # Snap
         elif goal_lower == "snap":
@@ -162,21 +167,15 @@ def browser(goal: str, mode: str = "normal_research") -> str:
         # Back/Forward/Reload
         elif goal_lower == "back":
             print("[Browser] Navigating back")
-            browser_automation("back")
-            time.sleep(1)
-            return browser_automation("snap")
+            return browser_automation("do_and_snap", {"action": "back"})
             
         elif goal_lower == "forward":
             print("[Browser] Navigating forward")
-            browser_automation("forward")
-            time.sleep(1)
-            return browser_automation("snap")
+            return browser_automation("do_and_snap", {"action": "forward"})
             
         elif goal_lower in ["reload", "refresh"]:
             print("[Browser] Reloading page")
-            browser_automation("reload")
-            time.sleep(1.5)
-            return browser_automation("snap")
+            return browser_automation("do_and_snap", {"action": "reload"})
         
         # Mode 3: Autonomous SoM-Based Browsing
         # If goal doesn't match any session command, treat as autonomous goal
@@ -6,26 +6,40 @@ import time
 from urllib.parse import quote_plus
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
-from .core import get_driver, open_browser, log_url
+from .core import get_driver, log_url
 from .helpers import human_click
 
+# Actions handled by perform_navigation (used by the dispatcher's lookup table)
+SUPPORTED_ACTIONS = frozenset({
+    "visit", "web_search", "reload", "back", "forward",
+    "new_tab", "change_tab", "close_tab", "get_tabs",
+})
+
+def _get_tabs_cdp(driver, handles, current):
+    """
+    Build get_tabs lines from CDP Target.getTargets (window handles are CDP target IDs).
+    Returns None when the driver has no CDP support or the call fails.
+    """
+    if not hasattr(driver, "execute_cdp_cmd"):
+        return None
+    try:
+        targets = driver.execute_cdp_cmd("Target.getTargets", {})["targetInfos"]
+    except Exception:
+        return None
+    pages = {t["targetId"]: t for t in targets if t.get("type") == "page"}
+    if not all(h in pages for h in handles):
+        return None
+    return [
+        f"[{i}] {pages[h]['title']} ({pages[h]['url']}) {'*' if h == current else ''}"
+        for i, h in enumerate(handles)
+    ]
+
+
 def perform_navigation(action: str, payload: str = None) -> str:
     driver = get_driver()
     
-    # Auto-restart if session is lost and action requires browser
-    if not driver and action not in ["open", "close", "nuke"]:
-        restart_res = open_browser()
-        driver = get_driver()
-        if not driver:
-            return f"Error: Browser session was lost and failed to restart. Reason: {restart_res}"
-        
-        # If the action was just to check something, we can proceed, 
-        # but if it was interaction, we are now on a blank page.
-        if action == "visit":
-            # We can proceed with visit
-            pass
-        else:
-            return "Browser session was lost and has been restarted (fresh state). Please retry your command."
+    if not driver:
+        return "Error: Browser not open."
 
     if action == "visit":
         if not payload: return "Error: URL required."
@@ -54,8 +68,8 @@ def perform_navigation(action: str, payload: str = None) -> str:
         try:
             search_box = driver.find_element(By.NAME, "q")
             search_box.clear()
-            search_box.send_keys(payload)
-            search_box.send_keys(Keys.RETURN)
+            # Query and submit in a single WebDriver command
+            search_box.send_keys(payload + Keys.RETURN)
             time.sleep(2)
             log_url(driver.current_url, f"Search: {payload}")
             
@@ -125,6 +139,12 @@ def perform_navigation(action: str, payload: str = None) -> str:
          try:
              handles = driver.window_handles
              current = driver.current_window_handle
+             
+             # Chromium: all titles/URLs in one CDP call, no window switching
+             tabs_info = _get_tabs_cdp(driver, handles, current)
+             if tabs_info is not None:
+                 return "\n".join(tabs_info)
+             
              tabs_info = []
              for i, h in enumerate(handles):
                  driver.switch_to.window(h)
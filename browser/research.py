@@ -2,9 +2,108 @@
 Deep Research Mode
 Autonomously browses multiple pages to gather information.
 """
+import io
+import re
+import html
 import time
+import asyncio
+import logging
+import itertools
+from concurrent.futures import ThreadPoolExecutor
 from .dispatcher import browser_automation
 from . import core
+from .helpers import wait_page_ready
+
+log = logging.getLogger(__name__)
+
+# Vision section of a snap: from its header up to the element list (or the end), in one pass
+_SNAP_RE = re.compile(r'(Visual Description.*?)(?:\n\nInteractive Elements|\Z)', re.DOTALL)
+
+# Static prefetch: pages with at least this much visible text skip the browser entirely
+_STATIC_MIN_TEXT = 500
+_STATIC_TIMEOUT = 10
+_STATIC_HEADERS = {"User-Agent": "Mozilla/5.0 (X11; Linux x86_64; rv:128.0) Gecko/20100101 Firefox/128.0"}
+_STRIP_BLOCKS_RE = re.compile(r'<(script|style|noscript|template)\b.*?</\1\s*>', re.I | re.DOTALL)
+_TAG_RE = re.compile(r'<[^>]+>')
+_SPACE_RE = re.compile(r'\s+')
+# Client-rendered apps ship their content as JS state, not markup
+_JS_APP_RE = re.compile(r'window\.__(?:INITIAL_STATE|NUXT|APOLLO_STATE)__|id="__next"')
+
+def _static_text(page):
+    """Visible text of a static HTML page, or None if it looks JS-rendered / too thin to use."""
+    if _JS_APP_RE.search(page):
+        return None
+    text = _SPACE_RE.sub(" ", html.unescape(_TAG_RE.sub(" ", _STRIP_BLOCKS_RE.sub(" ", page)))).strip()
+    return text if len(text) >= _STATIC_MIN_TEXT else None
+
+async def _fetch_static(urls):
+    """Fetch all urls concurrently over one aiohttp session; HTML bodies or None per url, in order."""
+    import aiohttp
+    
+    async def fetch(session, url):
+        try:
+            async with session.get(url) as resp:
+                if resp.status != 200 or "html" not in resp.headers.get("Content-Type", ""):
+                    return None
+                return await resp.text(errors="replace")
+        except Exception as e:
+            log.debug("Static fetch failed for %s: %r", url, e)
+            return None
+    
+    timeout = aiohttp.ClientTimeout(total=_STATIC_TIMEOUT)
+    async with aiohttp.ClientSession(timeout=timeout, headers=_STATIC_HEADERS) as session:
+        return await asyncio.gather(*(fetch(session, u) for u in urls))
+
+def _prefetch_static(urls):
+    """
+    Static text for each url (None where the browser is needed). Runs the event loop
+    in a helper thread when called from inside a running loop.
+    """
+    try:
+        import aiohttp  # noqa: F401
+    except ImportError:
+        return [None] * len(urls)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        pages = asyncio.run(_fetch_static(urls))
+    else:
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            pages = pool.submit(asyncio.run, _fetch_static(urls)).result()
+    return [_static_text(p) if p else None for p in pages]
+
+def _fetch_source(link, driver, static_text=None):
+    """
+    Summarize one source, from its prefetched static text when available,
+    otherwise by visiting it in the shared session.
+    Returns (report lines, finding dict or None on error).
+    """
+    lines = [f"URL: {link['url']}\n"]
+    if static_text:
+        summary = static_text[:1000]
+        lines.append(f"Summary: {summary[:300]}...\n")
+        return lines, {'url': link['url'], 'title': link['title'], 'summary': summary}
+    try:
+        browser_automation("visit", link['url'])
+        if driver:
+            wait_page_ready(driver, max_ms=10000)
+        
+        # Use snap to understand the page
+        snap_result = browser_automation("snap")
+        
+        # Extract just the vision description, falling back to body text
+        m = _SNAP_RE.search(snap_result)
+        summary = m.group(1) if m else browser_automation("get_content")[:1000]
+        
+        lines.append(f"Summary: {summary[:300]}...\n")
+        return lines, {
+            'url': link['url'],
+            'title': link['title'],
+            'summary': summary
+        }
+    except Exception as e:
+        lines.append(f"Error visiting source: {e}\n")
+        return lines, None
 
 def research(query: str, depth: int = 3, sources: int = 5) -> str:
     """
@@ -12,79 +111,60 @@ def research(query: str, depth: int = 3, sources: int = 5) -> str:
     Autonomously browses multiple pages, extracts information, and synthesizes an answer.
     """
     try:
-        # Ensure browser is open
+        # Ensure browser is open; a live session is reused, only a cold start launches Firefox
+        t0 = time.perf_counter()
         open_res = browser_automation("open")
         if "Failed" in open_res:
             return f"Error: {open_res}"
+        log.info("Research browser ready in %.2fs (%s)", time.perf_counter() - t0, open_res)
+        driver = core.get_driver()
         
-        report = [f"# Deep Research: {query}\n"]
+        # Sections are separated by a newline, streamed into one buffer
+        report = io.StringIO()
+        report.write(f"# Deep Research: {query}\n")
         
         # 1. Search for the query
         browser_automation("web_search", query)
-        time.sleep(2)
+        if driver:
+            wait_page_ready(driver, max_ms=10000)
         
         # 2. Get search results using snap
         snap_result = browser_automation("snap")
-        report.append("## Search Results\n")
-        report.append(snap_result[:500] + "...\n")
+        report.write("\n## Search Results\n")
+        report.write(f"\n{snap_result[:500]}...\n")
         
-        # 3. Extract links from element map
-        links = []
-        if core._element_map:
-            for idx, info in core._element_map.items():
-                if info.get('href') and 'http' in info['href']:
-                    links.append({
-                        'url': info['href'],
-                        'title': info['text'][:100]
-                    })
-                if len(links) >= sources:
-                    break
+        # 3. Extract the first `sources` absolute links from the element map
+        links = list(itertools.islice(
+            ({'url': href, 'title': info['text'][:100]}
+             for info in core._element_map.values()
+             if (href := info.get('href')) and href.startswith('http')),
+            sources
+        ))
         
         if not links:
             return "No search results found to research."
         
-        # 4. Visit each source and extract key information
+        # 4. Fetch static pages concurrently; only JS-rendered / failed ones go through the browser.
+        # Results are kept in link order.
+        static_texts = _prefetch_static([link['url'] for link in links])
+        log.info("Static fetch covered %d/%d sources", sum(t is not None for t in static_texts), len(links))
         findings = []
-        for i, link in enumerate(links[:sources]):
-            try:
-                report.append(f"\n## Source {i+1}: {link['title']}\n")
-                report.append(f"URL: {link['url']}\n")
-                
-                browser_automation("visit", link['url'])
-                time.sleep(2)
-                
-                # Use snap to understand the page
-                snap_result = browser_automation("snap")
-                
-                # Extract just the vision description
-                vision_start = snap_result.find("Visual Description")
-                if vision_start != -1:
-                    vision_end = snap_result.find("\n\nInteractive Elements", vision_start)
-                    if vision_end == -1:
-                        vision_end = len(snap_result)
-                    summary = snap_result[vision_start:vision_end]
-                else:
-                    # Fall back to body text
-                    summary = browser_automation("get_content")[:1000]
-                
-                findings.append({
-                    'url': link['url'],
-                    'title': link['title'],
-                    'summary': summary
-                })
-                
-                report.append(f"Summary: {summary[:300]}...\n")
-                
-            except Exception as e:
-                report.append(f"Error visiting source: {e}\n")
-                continue
+        for i, (link, static_text) in enumerate(zip(links, static_texts)):
+            lines, finding = _fetch_source(link, driver, static_text)
+            report.write(f"\n\n## Source {i+1}: {link['title']}\n")
+            for line in lines:
+                report.write(f"\n{line}")
+            if finding:
+                findings.append(finding)
+        
+        log.info("Researched %d sources in one session in %.2fs", len(findings), time.perf_counter() - t0)
         
         # 5. Return findings without LLM synthesis
-        report.append("\n## Findings\n")
+        report.write("\n\n## Findings\n")
         for i, f in enumerate(findings):
-            report.append(f"### Source {i+1}: {f['title']}\nURL: {f['url']}\n{f['summary']}\n")
+            report.write(f"\n### Source {i+1}: {f['title']}\nURL: {f['url']}\n{f['summary']}\n")
         
-        return "\n".join(report)
+        return report.getvalue()
         
     except Exception as e:
         return f"Research error: {e}"
@@ -1,19 +1,19 @@
 
 import sys
 import os
-from unittest.mock import MagicMock, patch
+from unittest.mock import DEFAULT, MagicMock, patch
 
 # Add src to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../")))
 
 from src.tools.browser.interface import browser
-from src.tools.browser import autonomous
+from src.tools.browser import autonomous, interface
 
 def test_context_transfer():
     print("Testing Context Transfer...")
     
     # Mock autonomous_browser to check arguments
-    with patch('src.tools.browser.interface.autonomous_browser') as mock_auto:
+    with patch.object(interface, 'autonomous_browser') as mock_auto:
         mock_auto.return_value = "Mock Success"
         
         test_context = "SYSTEM PROMPT: You are a helpful agent."
@@ -29,28 +29,25 @@ def test_context_transfer():
 def test_notification_trigger():
     print("\nTesting Notification Trigger...")
     
-    # Mock send_notification
-    with patch('src.tools.browser.autonomous.send_notification') as mock_notify:
-        # Mock dependencies to avoid real browser/LLM
-        with patch('src.tools.browser.autonomous.get_driver') as mock_driver:
-            mock_driver.return_value = MagicMock()
-            
-            with patch('src.tools.browser.autonomous.browser_automation') as mock_ba:
-                mock_ba.return_value = "Mock Result"
-                
-                # Mock LLM to return DONE
-                with patch('src.llm_gemini.GeminiLLM') as MockLLM:
-                    instance = MockLLM.return_value
-                    instance.generate.return_value = "COMMAND: DONE"
-                    
-                    # Run autonomous browser
-                    autonomous.autonomous_browser("Test Goal", context="Test Context")
-                    
-                    # Verify notification
-                    if mock_notify.called:
-                        print("PASS: Notification sent on DONE.")
-                    else:
-                        print("FAIL: Notification NOT sent.")
+    # Mock send_notification plus dependencies to avoid real browser/LLM, in one patch set
+    with patch.multiple(autonomous, send_notification=DEFAULT, get_driver=DEFAULT,
+                        browser_automation=DEFAULT) as mocks, \
+            patch('src.llm_gemini.GeminiLLM') as MockLLM:
+        mocks['get_driver'].return_value = MagicMock()
+        mocks['browser_automation'].return_value = "Mock Result"
+        
+        # Mock LLM to return DONE
+        instance = MockLLM.return_value
+        instance.generate.return_value = "COMMAND: DONE"
+        
+        # Run autonomous browser
+        autonomous.autonomous_browser("Test Goal", context="Test Context")
+        
+        # Verify notification
+        if mocks['send_notification'].called:
+            print("PASS: Notification sent on DONE.")
+        else:
+            print("FAIL: Notification NOT sent.")
 
 if __name__ == "__main__":
     test_context_transfer()
@@ -1,13 +1,23 @@
 """
 XPath Journal - Learns and caches robust XPaths for browser automation.
 """
+import re
 import json
 import os
+import sqlite3
+import functools
 from urllib.parse import urlparse
 from selenium.webdriver.remote.webelement import WebElement
 
+# Legacy JSON journal; imported once into the SQLite journal next to it
 JOURNAL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'xpath_journal.json')
+DB_PATH = os.path.splitext(JOURNAL_PATH)[0] + '.db'
 
+# IDs ending in a run of digits or a hex hash (e.g. "user-abc12345", "btn-3f9a1c0e")
+# are usually generated per render and make poor journal keys/XPaths
+_DYNAMIC_ID_RE = re.compile(r'(\d{2,}|[0-9a-f]{8,})$', re.I)
+
+@functools.lru_cache(maxsize=512)
 def get_domain(url):
     """Extract domain from URL."""
     try:
@@ -18,22 +28,65 @@ def get_domain(url):
     except:
         return "unknown"
 
-def load_journal():
-    """Load the journal from disk."""
-    if not os.path.exists(JOURNAL_PATH):
-        return {}
+@functools.cache
+def _db():
+    """
+    Open the journal database once per process (WAL, autocommit), creating the table
+    and importing the legacy JSON journal on first use.
+    """
+    conn = sqlite3.connect(DB_PATH, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS journal ("
+        "domain TEXT NOT NULL, name TEXT NOT NULL, xpath TEXT NOT NULL, "
+        "PRIMARY KEY (domain, name))"
+    )
+    if conn.execute("SELECT 1 FROM journal LIMIT 1").fetchone() is None:
+        _migrate_json(conn)
+    return conn
+
+def _migrate_json(conn):
+    """One-shot import of the legacy JSON journal into an empty database."""
     try:
         with open(JOURNAL_PATH, 'r') as f:
-            return json.load(f)
-    except:
-        return {}
+            legacy = json.load(f)
+    except FileNotFoundError:
+        return
+    except Exception as e:
+        print(f"[XPath Journal] Could not read legacy journal {JOURNAL_PATH}: {e}")
+        return
+    # A malformed legacy file must not keep the database from opening
+    try:
+        _upsert(conn, legacy)
+    except Exception as e:
+        print(f"[XPath Journal] Skipping import of malformed legacy journal {JOURNAL_PATH}: {e}")
+        return
+    print(f"[XPath Journal] Migrated {JOURNAL_PATH} -> {DB_PATH}")
+
+def _upsert(conn, data):
+    """Write a {domain: {name: xpath}} mapping in one transaction."""
+    rows = [(domain, name, xpath) for domain, names in data.items() for name, xpath in names.items()]
+    with conn:
+        conn.execute("BEGIN")
+        conn.executemany("INSERT OR REPLACE INTO journal (domain, name, xpath) VALUES (?, ?, ?)", rows)
+
+def load_journal():
+    """Load the whole journal as {domain: {name: xpath}}."""
+    journal = {}
+    try:
+        for domain, name, xpath in _db().execute("SELECT domain, name, xpath FROM journal"):
+            journal.setdefault(domain, {})[name] = xpath
+    except sqlite3.Error as e:
+        print(f"[XPath Journal] Error loading journal: {e}")
+    return journal
 
 def save_journal(data):
-    """Save the journal to disk."""
+    """Merge a {domain: {name: xpath}} mapping into the journal."""
     try:
-        with open(JOURNAL_PATH, 'w') as f:
-            json.dump(data, f, indent=2)
-    except Exception as e:
+        _upsert(_db(), data)
+        _cached_get.cache_clear()
+    except sqlite3.Error as e:
         print(f"[XPath Journal] Error saving journal: {e}")
 
 def get_xpath(url, name):
@@ -47,130 +100,158 @@ def get_xpath(url, name):
     Returns:
         str: XPath if found, else None
     """
-    domain = get_domain(url)
-    journal = load_journal()
-    
-    if domain in journal and name in journal[domain]:
-        return journal[domain][name]
-    return None
+    return _cached_get(get_domain(url), name)
+
+@functools.lru_cache(maxsize=1024)
+def _cached_get(domain, name):
+    """Per-process (domain, name) -> XPath lookup; cleared whenever save_xpath learns something."""
+    try:
+        row = _db().execute("SELECT xpath FROM journal WHERE domain = ? AND name = ?", (domain, name)).fetchone()
+    except sqlite3.Error as e:
+        print(f"[XPath Journal] Error reading journal: {e}")
+        return None
+    return row[0] if row else None
 
 def save_xpath(url, name, xpath):
     """
-    Save an XPath for a given name on a specific domain.
+    Save an XPath for a given name on a specific domain (single-row upsert).
     """
     domain = get_domain(url)
-    journal = load_journal()
-    
-    if domain not in journal:
-        journal[domain] = {}
-    
-    journal[domain][name] = xpath
-    save_journal(journal)
+    try:
+        _db().execute("INSERT OR REPLACE INTO journal (domain, name, xpath) VALUES (?, ?, ?)", (domain, name, xpath))
+    except sqlite3.Error as e:
+        print(f"[XPath Journal] Error saving XPath: {e}")
+        return
+    _cached_get.cache_clear()
     print(f"[XPath Journal] Learned XPath for '{name}' on {domain}: {xpath}")
 
-def generate_robust_xpath(element: WebElement, driver) -> str:
+# Every attribute both ladders below need, read in one WebDriver round-trip. inputCount is
+# the number of inputs sharing this input's type (for the type-uniqueness check).
+_ATTRS_JS = """
+var e = arguments[0], a = function (n) { return e.getAttribute(n); };
+var tag = e.tagName.toLowerCase(), type = a('type');
+return {
+    id: a('id'), name: a('name'), placeholder: a('placeholder'), aria: a('aria-label'),
+    title: a('title'), type: type, cls: a('class'), alt: a('alt'), tag: tag,
+    text: e.innerText || '',
+    inputCount: (tag === 'input' && type) ? Array.prototype.filter.call(
+        document.getElementsByTagName('input'), function (i) { return i.getAttribute('type') === type; }
+    ).length : 0
+};
+"""
+
+def _element_attrs(element: WebElement, driver=None) -> dict:
+    """Fetch the attribute bag for element in a single execute_script call."""
+    return (driver or element.parent).execute_script(_ATTRS_JS, element)
+
+def _xpath_literal(value: str) -> str:
+    """Quote value as an XPath string literal, using concat() when it has both quote kinds."""
+    if "'" not in value:
+        return f"'{value}'"
+    if '"' not in value:
+        return f'"{value}"'
+    return "concat('" + "', \"'\", '".join(value.split("'")) + "')"
+
+# XPath ladder, highest priority first: (attribute bag key, template, extra check or None).
+# Templates get the element's tag and the value already quoted by _xpath_literal.
+_XPATH_PRIORITIES = (
+    ('id', "//*[@id={v}]", lambda v, a: not _DYNAMIC_ID_RE.search(v)),
+    ('name', "//{tag}[@name={v}]", None),
+    ('placeholder', "//{tag}[@placeholder={v}]", None),
+    ('aria', "//{tag}[@aria-label={v}]", None),
+    ('title', "//{tag}[@title={v}]", None),
+    # Inputs by type only when no other input shares it
+    ('type', "//input[@type={v}]", lambda v, a: a['tag'] == "input" and a['inputCount'] == 1),
+    ('text', "//{tag}[contains(text(), {v})]", lambda v, a: len(v) < 50),
+    # First class (risky, but better than nothing)
+    ('first_cls', "//{tag}[contains(@class, {v})]", None),
+)
+
+def _xpath_from_attrs(attrs: dict) -> str:
     """
-    Generate a robust XPath for a given WebElement.
-    Prioritizes ID > Name > Placeholder > Aria-Label > Text > Class.
+    XPath ladder over an attribute bag (see _XPATH_PRIORITIES).
+    Prioritizes ID > Name > Placeholder > Aria-Label > Title > Type > Text > Class.
     """
-    try:
-        # 1. ID (if valid and not dynamic-looking)
-        el_id = element.get_attribute("id")
-        if el_id and not any(char.isdigit() for char in el_id[-4:]): # Heuristic for dynamic IDs
-            return f"//*[@id='{el_id}']"
-        
-        tag = element.tag_name
+    classes = (attrs['cls'] or "").split()
+    values = dict(attrs, first_cls=classes[0] if classes else None)
+    for key, template, check in _XPATH_PRIORITIES:
+        value = values[key]
+        if value and (check is None or check(value, values)):
+            return template.format(tag=attrs['tag'], v=_xpath_literal(value))
+    return None
+
+def _name_from_attrs(attrs: dict) -> str:
+    """
+    Journal-key ladder over an attribute bag.
+    Prioritizes: Aria-Label > Text > Title > Name > ID > Placeholder > Alt.
+    Returns None if no good name is found.
+    """
+    # 1. Aria-Label (often best for interactive elements)
+    aria = attrs['aria']
+    if aria and len(aria) < 50:
+        return aria.strip()
         
-        # 2. Name
-        name = element.get_attribute("name")
-        if name:
-            return f"//{tag}[@name='{name}']"
+    # 2. Text Content (for buttons/links)
+    text = attrs['text']
+    if text:
+        clean_text = text.strip().replace("\n", " ")
+        if 2 <= len(clean_text) < 30: # meaningful length
+            return clean_text
+    
+    # 3. Title
+    title = attrs['title']
+    if title and len(title) < 50:
+        return title.strip()
         
-        # 3. Placeholder
-        placeholder = element.get_attribute("placeholder")
-        if placeholder:
-            return f"//{tag}[@placeholder='{placeholder}']"
+    # 4. Name attribute
+    name = attrs['name']
+    if name and len(name) < 30:
+        return name.strip()
         
-        # 4. Aria-Label
-        aria = element.get_attribute("aria-label")
-        if aria:
-            return f"//{tag}[@aria-label='{aria}']"
+    # 5. Placeholder
+    placeholder = attrs['placeholder']
+    if placeholder and len(placeholder) < 50:
+        return placeholder.strip()
         
-        # 5. Title
-        title = element.get_attribute("title")
-        if title:
-            return f"//{tag}[@title='{title}']"
-            
-        # 6. Type (for inputs, combined with other attributes if possible, or just type if unique)
-        el_type = element.get_attribute("type")
-        if tag == "input" and el_type:
-            # Check if unique
-            others = driver.find_elements("xpath", f"//input[@type='{el_type}']")
-            if len(others) == 1:
-                return f"//input[@type='{el_type}']"
+    # 6. ID (if meaningful)
+    el_id = attrs['id']
+    if el_id and len(el_id) < 30 and not _DYNAMIC_ID_RE.search(el_id):
+        return el_id.strip()
         
-        # 7. Text Content (for buttons/links)
-        text = element.text
-        if text and len(text) < 50:
-            return f"//{tag}[contains(text(), '{text}')]"
-            
-        # 8. Class (risky, but better than nothing if unique)
-        cls = element.get_attribute("class")
-        if cls:
-            # Take the first class usually
-            first_cls = cls.split()[0] if cls.split() else ""
-            if first_cls:
-                return f"//{tag}[contains(@class, '{first_cls}')]"
+    # 7. Alt text (images)
+    alt = attrs['alt']
+    if alt and len(alt) < 50:
+        return alt.strip()
         
-        return None
-    except Exception as e:
-        print(f"[XPath Journal] Error generating XPath: {e}")
-        return None
+    return None
 
-def extract_element_name(element: WebElement) -> str:
+def _resolves(driver, xpath) -> bool:
+    """True if xpath matches anything on the page."""
+    try:
+        return bool(driver.find_elements("xpath", xpath))
+    except Exception:
+        return False
+
+def describe_element(element: WebElement, driver=None):
     """
-    Extract a meaningful name for an element to use as a journal key.
-    Prioritizes: Aria-Label > Text > Title > Name > ID > Placeholder > Alt.
-    Returns None if no good name is found.
+    Journal name and robust XPath for element from a single attribute round-trip.
+    Returns (name, xpath); either may be None.
     """
     try:
-        # 1. Aria-Label (often best for interactive elements)
-        aria = element.get_attribute("aria-label")
-        if aria and len(aria) < 50:
-            return aria.strip()
-            
-        # 2. Text Content (for buttons/links)
-        text = element.text
-        if text:
-            clean_text = text.strip().replace("\n", " ")
-            if 2 <= len(clean_text) < 30: # meaningful length
-                return clean_text
-        
-        # 3. Title
-        title = element.get_attribute("title")
-        if title and len(title) < 50:
-            return title.strip()
-            
-        # 4. Name attribute
-        name = element.get_attribute("name")
-        if name and len(name) < 30:
-            return name.strip()
-            
-        # 5. Placeholder
-        placeholder = element.get_attribute("placeholder")
-        if placeholder and len(placeholder) < 50:
-            return placeholder.strip()
-            
-        # 6. ID (if meaningful)
-        el_id = element.get_attribute("id")
-        if el_id and len(el_id) < 30 and not any(char.isdigit() for char in el_id[-4:]):
-            return el_id.strip()
-            
-        # 7. Alt text (images)
-        alt = element.get_attribute("alt")
-        if alt and len(alt) < 50:
-            return alt.strip()
-            
-        return None
-    except:
-        return None
+        attrs = _element_attrs(element, driver)
+    except Exception as e:
+        print(f"[XPath Journal] Error describing element: {e}")
+        return None, None
+    xpath = _xpath_from_attrs(attrs)
+    # Never journal an XPath that doesn't resolve; a bad entry would be retried forever
+    if xpath and driver and not _resolves(driver, xpath):
+        xpath = None
+    return _name_from_attrs(attrs), xpath
+
+def generate_robust_xpath(element: WebElement, driver) -> str:
+    """Generate a robust XPath for a given WebElement (see describe_element)."""
+    return describe_element(element, driver)[1]
+
+def extract_element_name(element: WebElement) -> str:
+    """Extract a meaningful journal key for an element, or None (see describe_element)."""
+    return describe_element(element)[0]